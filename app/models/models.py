@@ -1,11 +1,12 @@
 from pydantic import BaseModel
 
-from config import DEFAULT_STRATEGY, DEFAULT_LANGUAGE
+from config import DEFAULT_STRATEGY, DEFAULT_LANGUAGE, DEFAULT_LATENCY_BUDGET
 
 class AnonymizationRequest(BaseModel):
     text: str
     strategy: str = DEFAULT_STRATEGY
     language: str = DEFAULT_LANGUAGE
+    latency_budget: str = DEFAULT_LATENCY_BUDGET
 
 class EntityExplanation(BaseModel):
     entity: str
@@ -13,7 +14,14 @@ class EntityExplanation(BaseModel):
     type: str
     replacement: str
 
+class EscalationReport(BaseModel):
+    latency_budget: str
+    sentences: int
+    escalated_sentences: int
+    fallback: bool = False
+
 class AnonymizationResponse(BaseModel):
     original: str
     anonymized: str
     explanations: list[EntityExplanation]
+    escalation: EscalationReport | None = None
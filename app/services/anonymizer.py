@@ -2,19 +2,19 @@ from app.services.rule_based import RuleBasedDetector
 from app.services.nlp_based import NLPBasedDetector
 #from app.services.llm_based import LLMAnonimizer
 from app.utils.token_manager import TokenManager
-from config import SUPPORTED_STRATEGIES, SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE, DEFAULT_STRATEGY
+from config import SUPPORTED_STRATEGIES, SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE, DEFAULT_STRATEGY, DEFAULT_LATENCY_BUDGET, NLP_BATCH_SIZE
 
 class Anonymizer:
-    def __init__(self, strategy: str = DEFAULT_STRATEGY, lang: str = DEFAULT_LANGUAGE):
+    def __init__(self, strategy: str = DEFAULT_STRATEGY, lang: str = DEFAULT_LANGUAGE, latency_budget: str = DEFAULT_LATENCY_BUDGET, token_secret: bytes | None = None):
         if strategy not in SUPPORTED_STRATEGIES:
             raise ValueError(f"Unknown strategy: {strategy}")
         if lang not in SUPPORTED_LANGUAGES:
             raise ValueError(f"Unsupported language: {lang}")
         self.strategy = strategy
         self.lang = lang
-        self.token_manager = TokenManager()
+        self.token_manager = TokenManager(secret=token_secret)
         self.rule_based = RuleBasedDetector()
-        self.nlp_based = NLPBasedDetector()
+        self.nlp_based = NLPBasedDetector(latency_budget=latency_budget)
         #self.llm_based = LLMAnonimizer(lang)
 
     def anonymize(self, text: str) -> dict[str, str]:
@@ -28,6 +28,23 @@ class Anonymizer:
         
         return self._apply_strategy(text, all_entities)
 
+    def anonymize_batch(self, texts: list[str], batch_size: int = NLP_BATCH_SIZE) -> list[tuple[str, list[dict]]]:
+        """
+        Anonymize many texts, batching NER through spaCy's nlp.pipe.
+
+        Args:
+            texts: Input texts.
+            batch_size: Number of texts spaCy processes at a time.
+
+        Returns:
+            One (anonymized text, explanations) tuple per input text, in input order.
+        """
+        nlp_entities = self.nlp_based.detect_batch(texts, lang=self.lang, batch_size=batch_size)
+        return [
+            self._apply_strategy(text, {**self.rule_based.detect(text), **text_nlp_entities})
+            for text, text_nlp_entities in zip(texts, nlp_entities)
+        ]
+
     def _apply_strategy(self, text: str, entities: dict[str, dict]) -> tuple[str, list[dict]]:
         """
         Apply the selected anonymization strategy and generate explanations.
@@ -1,10 +1,96 @@
 import spacy
 from langdetect import detect, LangDetectException
-from config import SPACY_MODELS
+from config import (
+    SPACY_MODELS,
+    SPACY_ACCURATE_MODELS,
+    DEFAULT_LATENCY_BUDGET,
+    SUPPORTED_LATENCY_BUDGETS,
+    NER_CONFIDENCE_THRESHOLD,
+    NLP_BATCH_SIZE,
+)
+
+# Labels the small models use as a catch-all, which are often wrong.
+# The penalty alone takes an entity below NER_CONFIDENCE_THRESHOLD.
+AMBIGUOUS_LABELS = {"MISC"}
+AMBIGUOUS_LABEL_PENALTY = 0.5
+
+# Labels for names, where capitalization and span length say something about confidence.
+# Numeric labels (DATE, CARDINAL, MONEY, ...) are routinely single, lowercase tokens.
+NAME_LABELS = {"PERSON", "PER", "ORG", "LOC", "GPE", "MISC"}
+
+# Accurate models are shared by all detectors and only loaded on first use.
+# A value of None means the model is not installed and should not be retried.
+_accurate_models: dict[str, object] = {}
+
+
+class EscalationStats:
+    """Running totals of how much NER traffic was escalated to the accurate models."""
 
-class NLPBasedDetector:
     def __init__(self):
+        self.documents = 0
+        self.escalated_documents = 0
+        self.sentences = 0
+        self.escalated_sentences = 0
+        self.fallback_documents = 0
+
+    def record(self, sentences: int, escalated_sentences: int, fallback: bool = False):
+        self.documents += 1
+        self.sentences += sentences
+        self.escalated_sentences += escalated_sentences
+        if escalated_sentences:
+            self.escalated_documents += 1
+        if fallback:
+            self.fallback_documents += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "documents": self.documents,
+            "escalated_documents": self.escalated_documents,
+            "sentences": self.sentences,
+            "escalated_sentences": self.escalated_sentences,
+            "escalated_ratio": self.escalated_sentences / self.sentences if self.sentences else 0.0,
+            "fallback_documents": self.fallback_documents,
+        }
+
+
+escalation_stats = EscalationStats()
+
+
+def entity_confidence(ent) -> float:
+    """
+    Heuristic confidence for an entity found by a small model.
+    spaCy's greedy NER does not expose scores, so ambiguous labels are penalized
+    instead, as are single-token and non-capitalized spans for name labels.
+    """
+    confidence = 1.0
+    if ent.label_ in AMBIGUOUS_LABELS:
+        confidence -= AMBIGUOUS_LABEL_PENALTY
+    if ent.label_ in NAME_LABELS:
+        if len(ent) == 1:
+            confidence -= 0.2
+        if not ent.text[:1].isupper():
+            confidence -= 0.3
+    return max(confidence, 0.0)
+
+
+def sentence_confidence(sent) -> float:
+    """
+    Confidence for a sentence: the lowest entity confidence, capped when
+    proper nouns were left outside any entity (a likely missed entity).
+    """
+    confidence = min((entity_confidence(ent) for ent in sent.ents), default=1.0)
+    if any(token.pos_ == "PROPN" and token.ent_iob_ == "O" for token in sent):
+        confidence = min(confidence, 0.5)
+    return confidence
+
+
+class NLPBasedDetector:
+    def __init__(self, latency_budget: str = DEFAULT_LATENCY_BUDGET):
         """Initialize the NLP models for English and Portuguese."""
+        if latency_budget not in SUPPORTED_LATENCY_BUDGETS:
+            raise ValueError(f"Unsupported latency budget: {latency_budget}")
+        self.latency_budget = latency_budget
+        self.last_escalation = self._empty_escalation()
         self.models = {}
         missing_models = []
 
@@ -27,55 +113,200 @@ class NLPBasedDetector:
         Returns:
             Dictionary of entities with their types, detection method, and languages.
         """
-        entities = {}
+        self.last_escalation = self._empty_escalation()
+        entities = self._detect(text, lang)
+        escalation_stats.record(**self._escalation_counts())
+        return entities
 
-         # Auto-detect language if needed
+    def detect_batch(self, texts: list[str], lang: str = "auto", batch_size: int = NLP_BATCH_SIZE) -> list[dict[str, dict]]:
+        """
+        Detects entities in many texts, running each spaCy model over the batch with nlp.pipe.
+        Args:
+            texts: Input texts.
+            lang: "en" (English), "pt" (Portuguese), or "auto" (default: auto-detect per text).
+            batch_size: Number of texts spaCy processes at a time.
+        Returns:
+            One dictionary of entities per text, as returned by detect.
+        """
+        self.last_escalation = self._empty_escalation()
+        languages = [self._resolve_language(text, lang) for text in texts]
+
+        # Texts without a usable language go through every model, as in detect
+        docs = [{} for _ in texts]
+        for model_lang in self.models:
+            model = self._first_pass_model(model_lang)
+            indices = [i for i, text_lang in enumerate(languages) if text_lang in (model_lang, None)]
+            for i, doc in zip(indices, model.pipe((texts[i] for i in indices), batch_size=batch_size)):
+                docs[i][model_lang] = doc
+
+        results = []
+        batch_escalation = self._empty_escalation()
+        for text, text_lang, text_docs in zip(texts, languages, docs):
+            self.last_escalation = self._empty_escalation()
+            results.append(self._detect(text, text_lang, text_docs))
+            escalation_stats.record(**self._escalation_counts())
+            batch_escalation["sentences"] += self.last_escalation["sentences"]
+            batch_escalation["escalated_sentences"] += self.last_escalation["escalated_sentences"]
+            batch_escalation["fallback"] = batch_escalation["fallback"] or self.last_escalation["fallback"]
+        self.last_escalation = batch_escalation
+        return results
+
+    def _resolve_language(self, text: str, lang: str | None) -> str | None:
+        """
+        The model language to use for a text, or None when both models should be used.
+        """
+        # Auto-detect language if needed
         if lang == "auto":
             try:
                 detected_lang = detect(text)
                 lang = "pt" if detected_lang == "pt" else "en"
             except LangDetectException:
                 # If auto-detection fails, run both models as a fallback
-                return self._detect_with_both_models(text)
-
-        # Use the model specified in the config
-        if lang in self.models:
-            doc = self.models[lang](text)
-            # Extract entities from the processed document
-            for ent in doc.ents:
-                if ent.text not in entities:
-                    entities[ent.text] = {
-                        "method": "nlp",
-                        "type": ent.label_,
-                        "languages": [lang],
-                    }
-        else:
-            # If the specified language is not available, use both models
-            return self._detect_with_both_models(text)
+                return None
+
+        return lang if lang in self.models else None
+
+    def _detect(self, text: str, lang: str | None, docs: dict | None = None) -> dict[str, dict]:
+        entities = {}
+        docs = docs or {}
+
+        lang = self._resolve_language(text, lang)
+        if lang is None:
+            # If the language is unknown or not available, use both models
+            return self._detect_with_both_models(text, docs)
+
+        # Extract entities from the processed document
+        pairs, sentences, escalated = self._extract_entities(text, lang, docs.get(lang))
+        self.last_escalation["sentences"] += len(sentences)
+        self.last_escalation["escalated_sentences"] += len(escalated)
+        for ent_text, ent_label in pairs:
+            if ent_text not in entities:
+                entities[ent_text] = {
+                    "method": "nlp",
+                    "type": ent_label,
+                    "languages": [lang],
+                }
 
         return entities
 
-    def _detect_with_both_models(self, text: str) -> dict[str, dict]:
+    def _detect_with_both_models(self, text: str, docs: dict | None = None) -> dict[str, dict]:
         """
         Detects entities using both English and Portuguese models as a fallback.
         """
         entities = {}
+        docs = docs or {}
+
+        # The escalation report counts the first model's sentences once each,
+        # as escalated when any model escalated text overlapping them
+        reference_sentences = None
+        escalated_spans = []
 
         # Run both models
-        for lang, model in self.models.items():
-            doc = model(text)
-            for ent in doc.ents:
-                if ent.text not in entities:
-                    entities[ent.text] = {
+        for lang in self.models:
+            pairs, sentences, escalated = self._extract_entities(text, lang, docs.get(lang))
+            if reference_sentences is None:
+                reference_sentences = sentences
+            escalated_spans.extend(escalated)
+            for ent_text, ent_label in pairs:
+                if ent_text not in entities:
+                    entities[ent_text] = {
                         "method": "nlp",
-                        "type": ent.label_,
+                        "type": ent_label,
                         "languages": [lang],
                     }
                 else:
-                    if lang not in entities[ent.text]["languages"]:
-                        entities[ent.text]["languages"].append(lang)
+                    if lang not in entities[ent_text]["languages"]:
+                        entities[ent_text]["languages"].append(lang)
 
+        self.last_escalation["sentences"] += len(reference_sentences or [])
+        self.last_escalation["escalated_sentences"] += sum(
+            1 for start, end in reference_sentences or []
+            if any(start < escalated_end and escalated_start < end for escalated_start, escalated_end in escalated_spans)
+        )
         return entities
 
+    def _extract_entities(self, text: str, lang: str, doc=None) -> tuple[list[tuple[str, str]], list[tuple[int, int]], list[tuple[int, int]]]:
+        """
+        Runs NER for one language according to the latency budget.
+        A document already processed by the first-pass model for the language may be passed in.
+        Returns the (entity text, label) pairs, and the (start, end) character offsets
+        of all sentences and of the sentences handled by the accurate model.
+        """
+        first_pass_model = self._first_pass_model(lang)
+        if doc is None:
+            doc = first_pass_model(text)
+        sentences = list(doc.sents) if doc.has_annotation("SENT_START") else [doc[:]]
+
+        sentence_spans = [(sent.start_char, sent.end_char) for sent in sentences]
+
+        if first_pass_model is not self.models[lang]:
+            # The accurate budget already ran the accurate model over the whole text
+            escalated = sentences
+            accurate_model = None
+        elif self.latency_budget == "fast":
+            escalated = []
+            accurate_model = None
+        else:
+            escalated = sentences if self.latency_budget == "accurate" else [
+                sent for sent in sentences if sentence_confidence(sent) < NER_CONFIDENCE_THRESHOLD
+            ]
+            accurate_model = self._get_accurate_model(lang) if escalated else None
+            if accurate_model is None and escalated:
+                # The accurate model is not installed
+                self.last_escalation["fallback"] = True
+                escalated = []
+
+        escalated_spans = [(sent.start_char, sent.end_char) for sent in escalated]
+
+        if accurate_model is None:
+            return [(ent.text, ent.label_) for ent in doc.ents], sentence_spans, escalated_spans
+
+        if len(escalated) == len(sentences):
+            return [(ent.text, ent.label_) for ent in accurate_model(text).ents], sentence_spans, escalated_spans
+
+        # Keep small-model entities for confident sentences, re-run the rest
+        escalated_starts = {sent.start for sent in escalated}
+        results = [
+            (ent.text, ent.label_)
+            for sent in sentences if sent.start not in escalated_starts
+            for ent in sent.ents
+        ]
+        for accurate_doc in accurate_model.pipe(sent.text for sent in escalated):
+            results.extend((ent.text, ent.label_) for ent in accurate_doc.ents)
+        return results, sentence_spans, escalated_spans
+
+    def _first_pass_model(self, lang: str):
+        """
+        The model that processes the whole text first: the accurate model under
+        the accurate budget (when installed), otherwise the small model.
+        """
+        if self.latency_budget == "accurate":
+            accurate_model = self._get_accurate_model(lang)
+            if accurate_model is not None:
+                return accurate_model
+        return self.models[lang]
+
+    def _get_accurate_model(self, lang: str):
+        """Lazily load the accurate model for a language; None if it is not installed."""
+        if lang not in _accurate_models:
+            model_name = SPACY_ACCURATE_MODELS.get(lang)
+            try:
+                _accurate_models[lang] = spacy.load(model_name) if model_name else None
+            except OSError:
+                _accurate_models[lang] = None
+        return _accurate_models[lang]
 
+    def _empty_escalation(self) -> dict:
+        return {
+            "latency_budget": self.latency_budget,
+            "sentences": 0,
+            "escalated_sentences": 0,
+            "fallback": False,
+        }
 
+    def _escalation_counts(self) -> dict:
+        return {
+            "sentences": self.last_escalation["sentences"],
+            "escalated_sentences": self.last_escalation["escalated_sentences"],
+            "fallback": self.last_escalation["fallback"],
+        }
@@ -8,8 +8,10 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from app.services.anonymizer import Anonymizer
 from app.services.rule_based import RuleBasedDetector
-from app.services.nlp_based import NLPBasedDetector
+from app.services.nlp_based import NLPBasedDetector, EscalationStats, entity_confidence, sentence_confidence
 from app.utils.token_manager import TokenManager
+from config import NER_CONFIDENCE_THRESHOLD
+import cli
 
 # Initialize the anonymizers
 rule_based_anonymizer = RuleBasedDetector()
@@ -103,6 +105,142 @@ def test_nlp_based_mixed_language():
     assert "John" in result or "João" in result
 
 
+### Test Tiered NER
+def _blank_doc(words, ents=(), pos=None):
+    import spacy
+    from spacy.tokens import Doc, Span
+    doc = Doc(spacy.blank("en").vocab, words=words, pos=pos)
+    doc.ents = [Span(doc, start, end, label=label) for start, end, label in ents]
+    return doc
+
+def test_entity_confidence_penalizes_ambiguous_entities():
+    doc = _blank_doc(["John", "Doe", "likes", "chess", "Lisbon"], ents=[(0, 2, "PERSON"), (3, 4, "MISC"), (4, 5, "LOC")])
+    confident, ambiguous, single = doc.ents
+    assert entity_confidence(confident) == 1.0
+    assert entity_confidence(ambiguous) < entity_confidence(single) < entity_confidence(confident)
+
+def test_entity_confidence_escalates_any_ambiguous_label():
+    doc = _blank_doc(["John", "Doe", "watched", "the", "Copa", "do", "Mundo"], ents=[(0, 2, "PERSON"), (4, 7, "MISC")])
+    assert entity_confidence(doc.ents[1]) < NER_CONFIDENCE_THRESHOLD
+    assert sentence_confidence(doc[:]) < NER_CONFIDENCE_THRESHOLD
+
+def test_sentence_confidence_ignores_numeric_entities():
+    doc = _blank_doc(["Born", "in", "1990", "with", "5", "siblings"], ents=[(2, 3, "DATE"), (4, 5, "CARDINAL")])
+    assert sentence_confidence(doc[:]) == 1.0
+    assert sentence_confidence(doc[:]) >= NER_CONFIDENCE_THRESHOLD
+
+def test_sentence_confidence_flags_missed_proper_nouns():
+    doc = _blank_doc(["John", "Doe", "met", "Mary"], ents=[(0, 2, "PERSON")], pos=["PROPN", "PROPN", "VERB", "PROPN"])
+    assert sentence_confidence(doc[:]) == 0.5
+    assert sentence_confidence(doc[0:3]) == 1.0
+
+def test_nlp_based_fast_budget_does_not_escalate():
+    detector = NLPBasedDetector(latency_budget="fast")
+    detector.detect("John Doe works at Acme Corp in New York.", lang="en")
+    assert detector.last_escalation["latency_budget"] == "fast"
+    assert detector.last_escalation["sentences"] == 1
+    assert detector.last_escalation["escalated_sentences"] == 0
+
+def test_nlp_based_unsupported_latency_budget():
+    with pytest.raises(ValueError, match="Unsupported latency budget: slow"):
+        NLPBasedDetector(latency_budget="slow")
+
+def _stub_model(patterns):
+    import spacy
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": label, "pattern": text} for text, label in patterns])
+    return nlp
+
+@pytest.fixture
+def stub_detector(monkeypatch):
+    import app.services.nlp_based as nlp_based
+    small = _stub_model([("John Doe", "PERSON"), ("chess", "MISC"), ("Copa do Mundo", "MISC")])
+    accurate = _stub_model([("John Doe", "PERSON"), ("chess", "GAME"), ("Mary", "PERSON"), ("Copa do Mundo", "EVENT")])
+    monkeypatch.setattr(nlp_based.spacy, "load", lambda name: small)
+    monkeypatch.setattr(nlp_based, "_accurate_models", {"en": accurate, "pt": accurate})
+    detector = NLPBasedDetector(latency_budget="balanced")
+    detector.models = {"en": MagicMock(wraps=small), "pt": MagicMock(wraps=small)}
+    return detector
+
+def test_nlp_based_balanced_escalates_low_confidence_sentences(stub_detector):
+    result = stub_detector.detect("John Doe is here. Mary plays chess.", lang="en")
+    assert result["John Doe"]["type"] == "PERSON"
+    assert result["Mary"]["type"] == "PERSON"
+    assert result["chess"]["type"] == "GAME"
+    assert stub_detector.last_escalation == {
+        "latency_budget": "balanced",
+        "sentences": 2,
+        "escalated_sentences": 1,
+        "fallback": False,
+    }
+
+def test_nlp_based_balanced_escalates_multi_token_misc(stub_detector):
+    result = stub_detector.detect("John Doe watched the Copa do Mundo.", lang="en")
+    assert result["Copa do Mundo"]["type"] == "EVENT"
+    assert stub_detector.last_escalation["escalated_sentences"] == 1
+
+def test_nlp_based_balanced_escalates_whole_text(stub_detector):
+    result = stub_detector.detect("Mary plays chess.", lang="en")
+    assert set(result) == {"Mary", "chess"}
+    assert stub_detector.last_escalation["sentences"] == 1
+    assert stub_detector.last_escalation["escalated_sentences"] == 1
+
+def test_nlp_based_balanced_without_accurate_model(stub_detector, monkeypatch):
+    import app.services.nlp_based as nlp_based
+    monkeypatch.setattr(nlp_based, "_accurate_models", {"en": None})
+    result = stub_detector.detect("John Doe is here. Mary plays chess.", lang="en")
+    assert result["chess"]["type"] == "MISC"
+    assert "Mary" not in result
+    assert stub_detector.last_escalation["escalated_sentences"] == 0
+    assert stub_detector.last_escalation["fallback"] is True
+
+    stub_detector.latency_budget = "accurate"
+    stub_detector.detect("John Doe is here.", lang="en")
+    assert stub_detector.last_escalation["fallback"] is True
+
+    stub_detector.latency_budget = "fast"
+    stub_detector.detect("Mary plays chess.", lang="en")
+    assert stub_detector.last_escalation["fallback"] is False
+
+def test_nlp_based_accurate_skips_small_model(stub_detector):
+    stub_detector.latency_budget = "accurate"
+    result = stub_detector.detect("John Doe is here. Mary plays chess.", lang="en")
+    assert set(result) == {"John Doe", "Mary", "chess"}
+    assert stub_detector.last_escalation["sentences"] == 2
+    assert stub_detector.last_escalation["escalated_sentences"] == 2
+
+    results = stub_detector.detect_batch(["Mary plays chess.", "John Doe is here."], lang="en")
+    assert [set(entities) for entities in results] == [{"Mary", "chess"}, {"John Doe"}]
+    stub_detector.models["en"].assert_not_called()
+    stub_detector.models["en"].pipe.assert_not_called()
+
+def test_nlp_based_both_models_count_sentences_once(stub_detector):
+    stub_detector.detect("John Doe is here. Mary plays chess.", lang="unknown")
+    assert stub_detector.last_escalation["sentences"] == 2
+    assert stub_detector.last_escalation["escalated_sentences"] == 1
+
+def test_nlp_based_both_models_count_escalation_by_any_model(stub_detector):
+    # Only the second model is unsure about the second sentence
+    stub_detector.models["en"] = _stub_model([("John Doe", "PERSON"), ("chess", "GAME")])
+    stub_detector.detect("John Doe is here. Mary plays chess.", lang="unknown")
+    assert stub_detector.last_escalation["sentences"] == 2
+    assert stub_detector.last_escalation["escalated_sentences"] == 1
+
+def test_escalation_stats():
+    stats = EscalationStats()
+    stats.record(sentences=4, escalated_sentences=1)
+    stats.record(sentences=4, escalated_sentences=0)
+    assert stats.as_dict() == {
+        "documents": 2,
+        "escalated_documents": 1,
+        "sentences": 8,
+        "escalated_sentences": 1,
+        "escalated_ratio": 0.125,
+        "fallback_documents": 0,
+    }
+
+
 #------------------------------------------------------------------------
 #------------------------------------------------------------------------
 #------------------------------------------------------------------------
@@ -139,6 +277,7 @@ def test_anonymizer_initialization():
     anony = Anonymizer(strategy="masking", lang="pt")
     assert anony.strategy == "masking"
     assert anony.lang == "pt"
+    assert anony.nlp_based.latency_budget == "fast"
     assert isinstance(anony.token_manager, TokenManager)
     assert hasattr(anony, 'rule_based')
     assert hasattr(anony, 'nlp_based')
@@ -270,6 +409,25 @@ def test_overlapping_entities(anonymizer):
     assert len(result_explanations) == 2
     anonymizer.token_manager.get_token.assert_called()
 
+def test_anonymize_batch(anonymizer):
+    texts = ["John Doe's email is john.doe@example.com", "No entities here"]
+    anonymizer.rule_based.detect.side_effect = [
+        {"john.doe@example.com": {"method": "rule_based", "type": "email"}},
+        {},
+    ]
+    anonymizer.nlp_based.detect_batch.return_value = [
+        {"John Doe": {"method": "nlp", "type": "PERSON"}},
+        {},
+    ]
+    anonymizer.token_manager = MagicMock()
+    anonymizer.token_manager.get_token.side_effect = ["TOKEN_123", "TOKEN_456"]
+
+    results = anonymizer.anonymize_batch(texts, batch_size=8)
+
+    anonymizer.nlp_based.detect_batch.assert_called_once_with(texts, lang="en", batch_size=8)
+    assert results[0][0] == "TOKEN_123's email is TOKEN_456"
+    assert results[1] == ("No entities here", [])
+
 def test_anonymize_method(anonymizer):
     text = "John Doe's email is john.doe@example.com"
     # Mock detectors to return entities
@@ -288,4 +446,108 @@ def test_anonymize_method(anonymizer):
 
     expected_text = "TOKEN_123's email is TOKEN_456"
     assert result_text == expected_text
-    assert len(result_explanations) == 2
\ No newline at end of file
+    assert len(result_explanations) == 2
+
+### Test Token Manager
+def test_token_manager_consistent_tokens():
+    token_manager = TokenManager()
+    token = token_manager.get_token("John Doe")
+    assert token.startswith("TOKEN_") and len(token) == len("TOKEN_") + 8
+    assert token_manager.get_token("John Doe") == token
+    assert token_manager.stats()["hits"] == 1
+    assert token_manager.stats()["misses"] == 1
+
+def test_token_manager_evicts_when_full():
+    token_manager = TokenManager(capacity=2)
+    token_manager.get_token("John Doe")
+    token_manager.get_token("Jane Doe")
+    acme = token_manager.get_token("Acme Corp")
+
+    stats = token_manager.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert token_manager.get_token("Acme Corp") == acme
+
+def test_token_manager_starts_small_and_grows():
+    token_manager = TokenManager()
+    assert token_manager.stats()["memory_bytes"] < 4096
+
+    for i in range(1000):
+        token_manager.get_token(f"Entity {i}")
+    tokens = [token_manager.get_token(f"Entity {i}") for i in range(1000)]
+    assert tokens == [token_manager.get_token(f"Entity {i}") for i in range(1000)]
+    assert token_manager.stats()["hits"] == 2000
+    assert token_manager.stats()["evictions"] == 0
+
+def test_token_manager_invalid_capacity():
+    with pytest.raises(ValueError, match="Token store capacity must be positive: 0"):
+        TokenManager(capacity=0)
+
+def test_token_manager_shared_secret():
+    first = TokenManager(secret=b"shared")
+    second = TokenManager(secret=b"shared")
+    assert first.get_token("John Doe") == second.get_token("John Doe")
+    assert first.get_token("John Doe") != TokenManager(secret=b"other").get_token("John Doe")
+    assert first.hash_entity("John Doe") == second.hash_entity("John Doe")
+    assert first.hash_entity("John Doe").startswith("HASH_")
+
+
+### Test CLI
+def test_cli_detect_format():
+    assert cli.detect_format([]) == "text"
+    assert cli.detect_format(["corpus.jsonl"]) == "ndjson"
+    assert cli.detect_format(["corpus.CSV"]) == "csv"
+    assert cli.detect_format(["corpus.log"]) == "text"
+
+def test_cli_ndjson_round_trip():
+    import io
+    lines = ['{"id": 1, "text": "John Doe"}\n', "\n", '{"id": 2, "text": "Acme Corp"}\n']
+    records = list(cli.read_records([("corpus.ndjson", lines)], "ndjson", "text"))
+    assert [text for _, text in records] == ["John Doe", "Acme Corp"]
+
+    out = io.StringIO()
+    writer = cli.RecordWriter(out, "ndjson", "text")
+    for record, _ in records:
+        writer.write(record, "TOKEN_123", [])
+    assert out.getvalue() == '{"id": 1, "text": "TOKEN_123"}\n{"id": 2, "text": "TOKEN_123"}\n'
+
+def test_cli_csv_round_trip():
+    import io
+    lines = ["id,text\n", "1,John Doe\n"]
+    records = list(cli.read_records([("corpus.csv", lines)], "csv", "text"))
+    assert records == [({"id": "1", "text": "John Doe"}, "John Doe")]
+
+    out = io.StringIO()
+    cli.RecordWriter(out, "csv", "text").write(records[0][0], "TOKEN_123", [])
+    assert out.getvalue().splitlines() == ["id,text", "1,TOKEN_123"]
+
+def test_cli_reads_each_csv_input_with_its_header(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    first.write_text("id,text\n1,John Doe\n")
+    second.write_text("id,text\n2,Acme Corp\n")
+    records = list(cli.read_records(cli.open_inputs([str(first), str(second)]), "csv", "text"))
+    assert records == [({"id": "1", "text": "John Doe"}, "John Doe"), ({"id": "2", "text": "Acme Corp"}, "Acme Corp")]
+
+    second.write_text("text,id\nAcme Corp,2\n")
+    with pytest.raises(cli.InputError, match="does not match"):
+        list(cli.read_records(cli.open_inputs([str(first), str(second)]), "csv", "text"))
+
+def test_cli_rejects_records_without_text():
+    lines = ['{"text": "John Doe"}\n', '{"body": "Acme Corp"}\n']
+    with pytest.raises(cli.InputError, match="corpus.ndjson: record 2: missing text field 'text'"):
+        list(cli.read_records([("corpus.ndjson", lines)], "ndjson", "text"))
+
+    with pytest.raises(cli.InputError, match="record 1: text field 'text' is not a string"):
+        list(cli.read_records([("corpus.ndjson", ['{"text": null}\n'])], "ndjson", "text"))
+
+    with pytest.raises(cli.InputError, match="corpus.csv: record 2: expected 2 fields"):
+        list(cli.read_records([("corpus.csv", ["id,text\n", '1,"John Doe, hi"\n', "2,a,extra\n"])], "csv", "text"))
+
+    with pytest.raises(cli.InputError, match="corpus.csv: record 1: expected 2 fields"):
+        list(cli.read_records([("corpus.csv", ["id,text\n", "1\n"])], "csv", "text"))
+
+    with pytest.raises(cli.InputError, match="missing text column 'text'"):
+        list(cli.read_records([("corpus.csv", ["id,body\n", "1,John Doe\n"])], "csv", "text"))
+
+def test_cli_batched_keeps_order():
+    assert list(cli.batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
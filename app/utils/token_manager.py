@@ -1,22 +1,92 @@
-import uuid
+import hashlib
+import secrets
+from array import array
+
+from config import TOKEN_STORE_CAPACITY
+
+# Number of slots a new token store starts with
+INITIAL_SLOTS = 64
 
 class TokenManager:
-    def __init__(self):
-        self.token_store:dict[str, str] = {}
-    
+    def __init__(self, capacity: int = TOKEN_STORE_CAPACITY, secret: bytes | None = None):
+        """
+        Args:
+            capacity: Maximum number of entity-to-token mappings kept.
+            secret: Optional key from which token IDs and hashes are derived, so separate
+                managers (e.g. in other processes) sharing the secret give an entity the same
+                token and hash.
+        """
+        if capacity <= 0:
+            raise ValueError(f"Token store capacity must be positive: {capacity}")
+        self.capacity = capacity
+        self.secret = secret
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Open-addressing table kept at most half full. It starts small and doubles
+        # as entities arrive, up to the size needed to hold `capacity` entries.
+        # Keys are 64-bit entity digests (0 marks an empty slot), values are
+        # 32-bit token IDs and the reference bits drive CLOCK (approximate LRU) eviction.
+        max_slots = 1 << (2 * capacity - 1).bit_length()
+        self._allocate(min(INITIAL_SLOTS, max_slots))
+
     def get_token(self, entity: str) -> str:
         """
         Get a consistent token for an entity.
         If the entity is new, generate a new token.
+        Once the store is full a least recently used entity is evicted.
+        Without a secret an evicted entity gets a new random token the next time
+        it is seen; with a secret it gets the same token back.
         """
-        if entity not in self.token_store:
-            self.token_store[entity] = f"TOKEN_{uuid.uuid4().hex[:8]}"
-        return self.token_store[entity]
-    
+        key = self._digest(entity)
+        slot = self._find_slot(key)
+
+        if self._keys[slot] == key:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if self.size >= self.capacity:
+                self._evict()
+                slot = self._find_slot(key)
+            elif 2 * (self.size + 1) > len(self._keys):
+                self._grow()
+                slot = self._find_slot(key)
+            self._keys[slot] = key
+            self._token_ids[slot] = self._new_token_id(key)
+            self.size += 1
+
+        self._referenced[slot] = 1
+        return f"TOKEN_{self._token_ids[slot]:08x}"
+
+    def stats(self) -> dict:
+        """
+        Report the size, hit rate, evictions and memory footprint of the token store.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": self.size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_bytes": (
+                self._keys.itemsize * len(self._keys)
+                + self._token_ids.itemsize * len(self._token_ids)
+                + len(self._referenced)
+            ),
+        }
+
     def hash_entity(self, entity: str) -> str:
         """
         Hash an entity using a hash function.
+        Without a secret this is Python's hash(), which differs between processes.
         """
+        if self.secret is not None:
+            keyed = hashlib.blake2b(entity.encode("utf-8"), digest_size=8, key=self.secret)
+            return f"HASH_{int.from_bytes(keyed.digest(), 'big') % 1000000}" # does not avoid collision!
         return f"HASH_{hash(entity) % 1000000}" # does not avoid collision!
 
     def mask_entity(self, entity: str) -> str:
@@ -25,4 +95,91 @@ class TokenManager:
         """
         if len(entity) <= 2:
             return "*" * len(entity)
-        return entity[0] + "*" * (len(entity) - 2) + entity[-1]
\ No newline at end of file
+        return entity[0] + "*" * (len(entity) - 2) + entity[-1]
+
+    @staticmethod
+    def _digest(entity: str) -> int:
+        """
+        Fixed-size key for an entity, so the raw string is never stored.
+        """
+        digest = int.from_bytes(hashlib.blake2b(entity.encode("utf-8"), digest_size=8).digest(), "big")
+        return digest or 1
+
+    def _new_token_id(self, key: int) -> int:
+        """
+        Random 32-bit token ID, or one derived from the digest when a secret is set.
+        """
+        if self.secret is None:
+            return secrets.randbits(32)
+        keyed = hashlib.blake2b(key.to_bytes(8, "big"), digest_size=4, key=self.secret)
+        return int.from_bytes(keyed.digest(), "big")
+
+    def _allocate(self, slots: int):
+        """
+        Replace the table with an empty one of the given (power of two) size.
+        """
+        self._mask = slots - 1
+        self._keys = array("Q", [0]) * slots
+        self._token_ids = array("I", [0]) * slots
+        self._referenced = bytearray(slots)
+        self._clock_hand = 0
+
+    def _grow(self):
+        """
+        Double the table and rehash every entry into it.
+        """
+        keys, token_ids, referenced = self._keys, self._token_ids, self._referenced
+        self._allocate(2 * len(keys))
+        for old_slot, key in enumerate(keys):
+            if key:
+                slot = self._find_slot(key)
+                self._keys[slot] = key
+                self._token_ids[slot] = token_ids[old_slot]
+                self._referenced[slot] = referenced[old_slot]
+
+    def _find_slot(self, key: int) -> int:
+        """
+        Linear probing: the slot holding the key, or the empty slot where it belongs.
+        """
+        slot = key & self._mask
+        while self._keys[slot] and self._keys[slot] != key:
+            slot = (slot + 1) & self._mask
+        return slot
+
+    def _evict(self):
+        """
+        Advance the clock hand, clearing reference bits, until an unreferenced entry is found.
+        """
+        while True:
+            slot = self._clock_hand
+            self._clock_hand = (slot + 1) & self._mask
+            if not self._keys[slot]:
+                continue
+            if self._referenced[slot]:
+                self._referenced[slot] = 0
+                continue
+            self._delete(slot)
+            self.evictions += 1
+            return
+
+    def _delete(self, slot: int):
+        """
+        Remove an entry and shift later entries of its probe run back,
+        so lookups never need tombstones.
+        """
+        mask = self._mask
+        hole = slot
+        slot = (slot + 1) & mask
+        while self._keys[slot]:
+            home = self._keys[slot] & mask
+            # Move the entry into the hole unless its home lies cyclically in (hole, slot]
+            if (slot - home) & mask >= (slot - hole) & mask:
+                self._keys[hole] = self._keys[slot]
+                self._token_ids[hole] = self._token_ids[slot]
+                self._referenced[hole] = self._referenced[slot]
+                hole = slot
+            slot = (slot + 1) & mask
+        self._keys[hole] = 0
+        self._token_ids[hole] = 0
+        self._referenced[hole] = 0
+        self.size -= 1
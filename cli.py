@@ -0,0 +1,265 @@
+"""
+Offline anonymization of large corpora.
+
+Reads text (one record per line), NDJSON or CSV from files or stdin, anonymizes
+the records across a pool of worker processes and streams them out in input order.
+
+Example:
+    python cli.py corpus.ndjson -o anonymized.ndjson --workers 4
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import secrets
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+
+from app.services.anonymizer import Anonymizer
+from config import (
+    DEFAULT_STRATEGY,
+    DEFAULT_LANGUAGE,
+    DEFAULT_LATENCY_BUDGET,
+    SUPPORTED_STRATEGIES,
+    SUPPORTED_LANGUAGES,
+    SUPPORTED_LATENCY_BUDGETS,
+    NLP_BATCH_SIZE,
+)
+
+SUPPORTED_FORMATS = ["text", "ndjson", "csv"]
+FORMAT_EXTENSIONS = {".txt": "text", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+# Seconds between progress reports on stderr
+PROGRESS_INTERVAL = 5.0
+
+# Each worker process loads the models once and keeps its own Anonymizer
+_anonymizer = None
+
+
+def _init_worker(strategy: str, language: str, latency_budget: str, token_secret: bytes):
+    global _anonymizer
+    _anonymizer = Anonymizer(strategy=strategy, lang=language, latency_budget=latency_budget, token_secret=token_secret)
+
+
+def _anonymize_batch(texts: list[str]) -> list[tuple[str, list[dict]]]:
+    return _anonymizer.anonymize_batch(texts)
+
+
+def detect_format(paths: list[str]) -> str:
+    """
+    Guess the input format from the first file extension (stdin defaults to text).
+    """
+    if not paths or paths[0] == "-":
+        return "text"
+    return FORMAT_EXTENSIONS.get(Path(paths[0]).suffix.lower(), "text")
+
+
+class InputError(ValueError):
+    """An input file or record that cannot be anonymized."""
+
+
+def open_inputs(paths: list[str]):
+    """
+    Yield (name, lines) for every input, in order ("-" is stdin).
+    """
+    for path in paths or ["-"]:
+        if path == "-":
+            yield "<stdin>", sys.stdin
+        else:
+            with open(path, encoding="utf-8", newline="") as f:
+                yield path, f
+
+
+def _record_text(record, text_field: str, name: str, number: int) -> str:
+    if not isinstance(record, dict) or text_field not in record:
+        raise InputError(f"{name}: record {number}: missing text field '{text_field}'")
+    if not isinstance(record[text_field], str):
+        raise InputError(f"{name}: record {number}: text field '{text_field}' is not a string")
+    return record[text_field]
+
+
+def read_records(inputs, input_format: str, text_field: str):
+    """
+    Parse every input into records.
+    Yields (record, text) pairs, where record is the value written back with the anonymized text.
+    Raises InputError for a record without a string text field, a CSV row whose field count
+    differs from its header, and CSV inputs whose headers differ.
+    """
+    if input_format not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format: {input_format}")
+
+    fieldnames = None
+    for name, lines in inputs:
+        if input_format == "text":
+            for line in lines:
+                text = line.rstrip("\r\n")
+                yield text, text
+        elif input_format == "ndjson":
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise InputError(f"{name}: record {number}: invalid JSON ({e.msg})") from e
+                yield record, _record_text(record, text_field, name, number)
+        else:
+            # Each CSV input has its own header row
+            reader = csv.DictReader(lines)
+            if reader.fieldnames is None:
+                continue
+            if fieldnames is None:
+                fieldnames = reader.fieldnames
+            elif reader.fieldnames != fieldnames:
+                raise InputError(f"{name}: header {reader.fieldnames} does not match {fieldnames}")
+            if text_field not in fieldnames:
+                raise InputError(f"{name}: missing text column '{text_field}'")
+            for number, record in enumerate(reader, 1):
+                # DictReader files extra fields under None and fills missing ones with None
+                if None in record or None in record.values():
+                    raise InputError(f"{name}: record {number}: expected {len(fieldnames)} fields")
+                yield record, _record_text(record, text_field, name, number)
+
+
+class RecordWriter:
+    """Writes anonymized records in the input format."""
+
+    def __init__(self, out, output_format: str, text_field: str, explanations: bool = False):
+        self.out = out
+        self.output_format = output_format
+        self.text_field = text_field
+        self.explanations = explanations
+        self._csv_writer = None
+
+    def write(self, record, anonymized: str, explanations: list[dict]):
+        if self.output_format == "text":
+            self.out.write(anonymized + "\n")
+            return
+
+        record = {**record, self.text_field: anonymized}
+        if self.explanations:
+            record["explanations"] = explanations if self.output_format == "ndjson" else json.dumps(explanations)
+
+        if self.output_format == "ndjson":
+            self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            if self._csv_writer is None:
+                self._csv_writer = csv.DictWriter(self.out, fieldnames=list(record))
+                self._csv_writer.writeheader()
+            self._csv_writer.writerow(record)
+
+
+def batched(records, batch_size: int):
+    """
+    Group records into lists of at most batch_size items.
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def anonymize_batches(batches, pool=None, max_in_flight: int = 1):
+    """
+    Yield (batch, results) pairs in input order.
+    With a pool, at most max_in_flight batches are submitted ahead of the one being written,
+    so memory stays bounded however large the input is.
+    """
+    if pool is None:
+        for batch in batches:
+            yield batch, _anonymize_batch([text for _, text in batch])
+        return
+
+    in_flight = deque()
+    for batch in batches:
+        in_flight.append((batch, pool.apply_async(_anonymize_batch, ([text for _, text in batch],))))
+        if len(in_flight) >= max_in_flight:
+            batch, result = in_flight.popleft()
+            yield batch, result.get()
+    while in_flight:
+        batch, result = in_flight.popleft()
+        yield batch, result.get()
+
+
+def run(args) -> int:
+    """
+    Anonymize every input record and return the number of records written.
+    """
+    input_format = args.format or detect_format(args.inputs)
+    # Shared by all workers so an entity gets the same token or hash whichever worker sees it
+    token_secret = secrets.token_bytes(32)
+    init_args = (args.strategy, args.language, args.latency_budget, token_secret)
+    batches = batched(read_records(open_inputs(args.inputs), input_format, args.text_field), args.batch_size)
+
+    # Load the models here first so a missing model fails fast instead of inside every worker
+    _init_worker(*init_args)
+    if args.workers > 1:
+        pool = Pool(args.workers, initializer=_init_worker, initargs=init_args)
+        # The workers load their own models, so free the parent's copy
+        global _anonymizer
+        _anonymizer = None
+        gc.collect()
+        results = anonymize_batches(batches, pool, max_in_flight=2 * args.workers)
+    else:
+        pool = None
+        results = anonymize_batches(batches)
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    writer = RecordWriter(out, input_format, args.text_field, args.explanations)
+    count = 0
+    start = last_report = time.monotonic()
+    try:
+        for batch, batch_results in results:
+            for (record, _), (anonymized, explanations) in zip(batch, batch_results):
+                writer.write(record, anonymized, explanations)
+            count += len(batch)
+
+            now = time.monotonic()
+            if not args.quiet and now - last_report >= PROGRESS_INTERVAL:
+                print(f"{count} records, {count / (now - start):.1f} records/sec", file=sys.stderr)
+                last_report = now
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not sys.stdout:
+            out.close()
+
+    if not args.quiet:
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed else 0.0
+        print(f"Done: {count} records in {elapsed:.1f}s, {rate:.1f} records/sec", file=sys.stderr)
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Anonymize text, NDJSON or CSV records offline.")
+    parser.add_argument("inputs", nargs="*", help="Input files (default: stdin, or '-').")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout).")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="Input format (default: from the file extension).")
+    parser.add_argument("--text-field", default="text", help="NDJSON key or CSV column holding the text (default: text).")
+    parser.add_argument("--strategy", choices=SUPPORTED_STRATEGIES, default=DEFAULT_STRATEGY)
+    parser.add_argument("--language", choices=SUPPORTED_LANGUAGES, default=DEFAULT_LANGUAGE)
+    parser.add_argument("--latency-budget", choices=SUPPORTED_LATENCY_BUDGETS, default=DEFAULT_LATENCY_BUDGET)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count).")
+    parser.add_argument("--batch-size", type=int, default=NLP_BATCH_SIZE, help="Records per worker batch.")
+    parser.add_argument("--explanations", action="store_true", help="Include explanations in NDJSON/CSV output.")
+    parser.add_argument("--quiet", action="store_true", help="Do not report progress on stderr.")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be positive")
+    return args
+
+
+if __name__ == "__main__":
+    try:
+        run(parse_args())
+    except InputError as e:
+        sys.exit(f"error: {e}")
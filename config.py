@@ -13,3 +13,25 @@ SPACY_MODELS = {
     "en": "en_core_web_sm",
     "pt": "pt_core_news_sm"
 }
+
+# Higher-accuracy spaCy models, loaded lazily for the second NER pass
+SPACY_ACCURATE_MODELS = {
+    "en": "en_core_web_lg",
+    "pt": "pt_core_news_lg"
+}
+
+# Latency budgets for NER:
+#   "fast"     - small models only
+#   "balanced" - small models first, low-confidence sentences escalated to the accurate models
+#   "accurate" - accurate models for the whole text
+DEFAULT_LATENCY_BUDGET = "fast"
+SUPPORTED_LATENCY_BUDGETS = ["fast", "balanced", "accurate"]
+
+# Sentences whose NER confidence falls below this threshold are escalated
+NER_CONFIDENCE_THRESHOLD = 0.6
+
+# Maximum number of entity-to-token mappings kept by a TokenManager (least recently used are evicted)
+TOKEN_STORE_CAPACITY = 1_000_000
+
+# Number of texts spaCy processes at a time in batch mode (nlp.pipe)
+NLP_BATCH_SIZE = 64
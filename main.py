@@ -3,9 +3,17 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.models.models import AnonymizationRequest, AnonymizationResponse, EntityExplanation
-from config import DEFAULT_STRATEGY, DEFAULT_LANGUAGE, SUPPORTED_STRATEGIES, SUPPORTED_LANGUAGES
+from app.models.models import AnonymizationRequest, AnonymizationResponse, EntityExplanation, EscalationReport
+from config import (
+    DEFAULT_STRATEGY,
+    DEFAULT_LANGUAGE,
+    DEFAULT_LATENCY_BUDGET,
+    SUPPORTED_STRATEGIES,
+    SUPPORTED_LANGUAGES,
+    SUPPORTED_LATENCY_BUDGETS,
+)
 from app.services.anonymizer import Anonymizer
+from app.services.nlp_based import escalation_stats
 
 # Initialize FastAPI
 app = FastAPI(title="Text Anonymization API")
@@ -37,15 +45,17 @@ async def anonymize(request: Request, text: str = Form(None)):
         text = data.get("text", text)
         strategy = data.get("strategy", DEFAULT_STRATEGY)
         language = data.get("language", DEFAULT_LANGUAGE)
+        latency_budget = data.get("latency_budget", DEFAULT_LATENCY_BUDGET)
     except Exception:
         # Fallback if it's form-data
         strategy = DEFAULT_STRATEGY
         language = DEFAULT_LANGUAGE
+        latency_budget = DEFAULT_LATENCY_BUDGET
 
     if not text:
         raise HTTPException(status_code=400, detail="No text provided")
 
-    anonymizer = Anonymizer(strategy=strategy, lang=language)
+    anonymizer = Anonymizer(strategy=strategy, lang=language, latency_budget=latency_budget)
     anonymized_text, explanations_data = anonymizer.anonymize(text)
 
     explanations = [
@@ -61,7 +71,8 @@ async def anonymize(request: Request, text: str = Form(None)):
     return AnonymizationResponse(
         original=text,
         anonymized=anonymized_text,
-        explanations=explanations
+        explanations=explanations,
+        escalation=EscalationReport(**anonymizer.nlp_based.last_escalation)
     )
 
 @app.get("/info")
@@ -72,10 +83,18 @@ async def api_info():
         "supported_strategies": SUPPORTED_STRATEGIES,
         "supported_languages": SUPPORTED_LANGUAGES,
         "default_strategy": DEFAULT_STRATEGY,
-        "default_language": DEFAULT_LANGUAGE
+        "default_language": DEFAULT_LANGUAGE,
+        "supported_latency_budgets": SUPPORTED_LATENCY_BUDGETS,
+        "default_latency_budget": DEFAULT_LATENCY_BUDGET
     }
 
 
+@app.get("/stats")
+async def escalation_statistics():
+    """How much NER traffic was escalated to the accurate models since startup."""
+    return escalation_stats.as_dict()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""